@@ -0,0 +1,459 @@
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from app.database import obter_conexao_str, obter_geracao_carga, normalizar_nome
+
+logger = logging.getLogger('consulta')
+
+# Colunas retornadas em cada consulta (estabelecimento + empresa)
+CAMPOS_RESULTADO = (
+    'cnpj', 'cnpj_basico', 'cnpj_ordem', 'cnpj_dv', 'identificador_matriz', 'nome_fantasia',
+    'situacao_cadastral', 'data_situacao_cadastral', 'cnae_principal', 'cnae_principal_descricao',
+    'tipo_logradouro', 'logradouro', 'bairro', 'cep', 'uf', 'email',
+    'razao_social', 'natureza_juridica', 'natureza_juridica_descricao',
+    'qualificacao_responsavel', 'qualificacao_responsavel_descricao',
+    'capital_social', 'porte_empresa', 'ente_federativo',
+)
+
+# Colunas retornadas na busca por nome
+CAMPOS_BUSCA = ('cnpj_basico', 'cnpj', 'origem', 'nome', 'similaridade')
+
+# Cada carga acrescenta uma nova cópia dos registros: como em construir_cnpj_completo,
+# as consultas retornam apenas o estabelecimento e a empresa mais recentes de cada CNPJ
+_SELECT_RESULTADO = '''
+    SELECT DISTINCT ON (e.cnpj_basico, e.cnpj_ordem, e.cnpj_dv)
+           e.cnpj_basico || e.cnpj_ordem || e.cnpj_dv, e.cnpj_basico, e.cnpj_ordem, e.cnpj_dv,
+           e.identificador_matriz, e.nome_fantasia, e.situacao_cadastral,
+           e.data_situacao_cadastral, e.cnae_principal, e.cnae_principal_descricao,
+           e.tipo_logradouro, e.logradouro, e.bairro, e.cep, e.uf, e.email,
+           emp.razao_social, emp.natureza_juridica, emp.natureza_juridica_descricao,
+           emp.qualificacao_responsavel, emp.qualificacao_responsavel_descricao,
+           emp.capital_social, emp.porte_empresa, emp.ente_federativo
+'''
+_ORDEM_MAIS_RECENTE = 'ORDER BY e.cnpj_basico, e.cnpj_ordem, e.cnpj_dv, e.id DESC, emp.id DESC'
+
+# Comandos preparados uma vez por conexão do pool
+_COMANDOS_PREPARADOS = {
+    'consulta_cnpj': f'''
+        PREPARE consulta_cnpj(text[], text[], text[]) AS
+        {_SELECT_RESULTADO}
+        FROM unnest($1, $2, $3) AS c(basico, ordem, dv)
+        JOIN estabelecimentos e
+          ON e.cnpj_basico = c.basico AND e.cnpj_ordem = c.ordem AND e.cnpj_dv = c.dv
+        LEFT JOIN empresas emp ON emp.cnpj_basico = e.cnpj_basico
+        {_ORDEM_MAIS_RECENTE}
+    ''',
+    'consulta_cnpj_basico': f'''
+        PREPARE consulta_cnpj_basico(text[]) AS
+        {_SELECT_RESULTADO}
+        FROM estabelecimentos e
+        LEFT JOIN empresas emp ON emp.cnpj_basico = e.cnpj_basico
+        WHERE e.cnpj_basico = ANY($1)
+        {_ORDEM_MAIS_RECENTE}
+    ''',
+    'consulta_cnpj_completo': '''
+        PREPARE consulta_cnpj_completo(text[]) AS
+        SELECT cnpj, cnpj_basico, cnpj_ordem, cnpj_dv, identificador_matriz, nome_fantasia,
+               situacao_cadastral, data_situacao_cadastral, cnae_principal, cnae_principal_descricao,
+               tipo_logradouro, logradouro, bairro, cep, uf, email,
+               razao_social, natureza_juridica, natureza_juridica_descricao,
+               qualificacao_responsavel, qualificacao_responsavel_descricao,
+               capital_social, porte_empresa, ente_federativo
+        FROM cnpj_completo
+        WHERE cnpj = ANY($1)
+    ''',
+    'busca_razao_social': '''
+        PREPARE busca_razao_social(text, text, int) AS
+        SELECT cnpj_basico, NULL, 'razao_social', razao_social,
+               similarity(razao_social_normalizada, $1) AS similaridade
+        FROM empresas
+        WHERE razao_social_normalizada LIKE $2
+        ORDER BY similaridade DESC, razao_social
+        LIMIT $3
+    ''',
+    'busca_nome_fantasia': '''
+        PREPARE busca_nome_fantasia(text, text, int) AS
+        SELECT cnpj_basico, cnpj_basico || cnpj_ordem || cnpj_dv, 'nome_fantasia', nome_fantasia,
+               similarity(nome_fantasia_normalizado, $1) AS similaridade
+        FROM estabelecimentos
+        WHERE nome_fantasia_normalizado LIKE $2
+        ORDER BY similaridade DESC, nome_fantasia
+        LIMIT $3
+    ''',
+}
+
+_NAO_DIGITOS = re.compile(r'\D')
+_CURINGAS_LIKE = re.compile(r'([\\%_])')
+
+# Marca resultados negativos no cache (CNPJ consultado e não encontrado)
+_AUSENTE = object()
+
+def normalizar_cnpj(cnpj, digitos=14):
+    """
+    Remove pontuação e completa com zeros à esquerda
+
+    Args:
+        cnpj: CNPJ completo (14 dígitos) ou básico (8 dígitos), com ou sem máscara
+        digitos: Quantidade de dígitos esperada
+
+    Returns:
+        String apenas com dígitos, ou None se o valor for inválido
+    """
+    valor = _NAO_DIGITOS.sub('', str(cnpj))
+    if not valor or len(valor) > digitos:
+        return None
+    return valor.zfill(digitos)
+
+class _ConexaoConsulta(psycopg2.extensions.connection):
+    """
+    Conexão que registra quais comandos preparados já foram criados nela
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autocommit = True
+        self.preparados = set()
+
+class CacheLRU:
+    """
+    Cache LRU com expiração (TTL), seguro para uso entre threads
+    """
+
+    def __init__(self, capacidade=100_000, ttl=3600):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, chave, padrao=None):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return padrao
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return padrao
+            self._itens.move_to_end(chave)
+            return valor
+
+    def definir(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+class ConsultaCNPJ:
+    """
+    Consultas de CNPJ (individuais e em lote) sobre as tabelas carregadas.
+
+    Usa um pool de conexões com comandos preparados e mantém um cache LRU em
+    memória, descartado automaticamente quando uma nova carga é registrada.
+    """
+
+    def __init__(self, conexao_str=None, min_conexoes=1, max_conexoes=4,
+                 capacidade_cache=100_000, ttl_cache=3600, intervalo_geracao=30,
+                 tamanho_bloco=5000, usar_cnpj_completo=False):
+        """
+        Args:
+            conexao_str: String de conexão com o PostgreSQL (usa o .env se None)
+            min_conexoes: Quantidade mínima de conexões mantidas no pool
+            max_conexoes: Quantidade máxima de conexões do pool
+            capacidade_cache: Quantidade máxima de entradas no cache
+            ttl_cache: Tempo de vida, em segundos, de cada entrada do cache
+            intervalo_geracao: Intervalo, em segundos, entre verificações de nova carga
+            tamanho_bloco: Quantidade máxima de CNPJs enviados em cada consulta ao banco
+            usar_cnpj_completo: Se True, consulta CNPJs completos na tabela
+                                desnormalizada cnpj_completo em vez de fazer a junção
+        """
+        self.pool = ThreadedConnectionPool(
+            min_conexoes, max_conexoes, obter_conexao_str(conexao_str),
+            connection_factory=_ConexaoConsulta
+        )
+        self.cache = CacheLRU(capacidade_cache, ttl_cache)
+        self.intervalo_geracao = intervalo_geracao
+        self.tamanho_bloco = tamanho_bloco
+        self.usar_cnpj_completo = usar_cnpj_completo
+        self.geracao = None
+        self._verificada_em = 0.0
+        self._trava_geracao = threading.Lock()
+
+    def _verificar_geracao(self, conn):
+        """
+        Limpa o cache se uma nova carga foi registrada desde a última verificação
+        """
+        agora = time.monotonic()
+        if agora - self._verificada_em < self.intervalo_geracao:
+            return
+        with self._trava_geracao:
+            if agora - self._verificada_em < self.intervalo_geracao:
+                return
+            geracao = obter_geracao_carga(conn)
+            if geracao != self.geracao:
+                if self.geracao is not None:
+                    logger.info(f"Nova carga detectada (geração {geracao}); limpando cache")
+                self.cache.limpar()
+                self.geracao = geracao
+            self._verificada_em = agora
+
+    def invalidar_cache(self):
+        """
+        Descarta todas as entradas do cache
+        """
+        self.cache.limpar()
+
+    def _executar(self, nome, parametros, campos=CAMPOS_RESULTADO):
+        conn = self.pool.getconn()
+        descartar = False
+        try:
+            self._verificar_geracao(conn)
+            with conn.cursor() as cursor:
+                # Preparar o comando na primeira vez em que é usado nesta conexão
+                if nome not in conn.preparados:
+                    cursor.execute(_COMANDOS_PREPARADOS[nome])
+                    conn.preparados.add(nome)
+                cursor.execute(
+                    f"EXECUTE {nome} ({', '.join(['%s'] * len(parametros))})",
+                    parametros
+                )
+                linhas = cursor.fetchall()
+        except psycopg2.Error:
+            # Descartar a conexão em caso de erro para não reaproveitar um estado inválido
+            descartar = True
+            raise
+        finally:
+            self.pool.putconn(conn, close=descartar)
+        return [dict(zip(campos, linha)) for linha in linhas]
+
+    def consultar_lote(self, cnpjs):
+        """
+        Consulta vários CNPJs completos (14 dígitos)
+
+        Args:
+            cnpjs: Iterável de CNPJs, com ou sem máscara
+
+        Returns:
+            dict: CNPJ normalizado -> dados do estabelecimento e da empresa (ou None)
+        """
+        resultado = {}
+        pendentes = []
+        for cnpj in cnpjs:
+            chave = normalizar_cnpj(cnpj)
+            if chave is None or chave in resultado:
+                continue
+            valor = self.cache.obter(('cnpj', chave))
+            if valor is None:
+                pendentes.append(chave)
+                resultado[chave] = None
+            else:
+                # Cópia, para que alterações feitas por quem chamou não cheguem ao cache
+                resultado[chave] = None if valor is _AUSENTE else dict(valor)
+
+        for inicio in range(0, len(pendentes), self.tamanho_bloco):
+            bloco = pendentes[inicio:inicio + self.tamanho_bloco]
+            if self.usar_cnpj_completo:
+                linhas = self._executar('consulta_cnpj_completo', (bloco,))
+            else:
+                linhas = self._executar('consulta_cnpj', (
+                    [c[:8] for c in bloco], [c[8:12] for c in bloco], [c[12:] for c in bloco]
+                ))
+            for linha in linhas:
+                resultado[linha['cnpj']] = linha
+            for chave in bloco:
+                valor = resultado[chave]
+                self.cache.definir(('cnpj', chave), _AUSENTE if valor is None else dict(valor))
+
+        return resultado
+
+    def consultar(self, cnpj):
+        """
+        Consulta um CNPJ completo (14 dígitos)
+
+        Returns:
+            dict com os dados do estabelecimento e da empresa, ou None
+        """
+        chave = normalizar_cnpj(cnpj)
+        if chave is None:
+            return None
+        return self.consultar_lote([chave])[chave]
+
+    def consultar_basico_lote(self, cnpjs_basicos):
+        """
+        Consulta todos os estabelecimentos de vários CNPJs básicos (8 dígitos)
+
+        Args:
+            cnpjs_basicos: Iterável de CNPJs básicos
+
+        Returns:
+            dict: CNPJ básico -> lista de estabelecimentos (vazia se não encontrado)
+        """
+        resultado = {}
+        pendentes = []
+        for cnpj_basico in cnpjs_basicos:
+            chave = normalizar_cnpj(cnpj_basico, digitos=8)
+            if chave is None or chave in resultado:
+                continue
+            valor = self.cache.obter(('basico', chave))
+            if valor is None:
+                pendentes.append(chave)
+                resultado[chave] = []
+            else:
+                # Cópia, para que alterações feitas por quem chamou não cheguem ao cache
+                resultado[chave] = [dict(linha) for linha in valor]
+
+        for inicio in range(0, len(pendentes), self.tamanho_bloco):
+            bloco = pendentes[inicio:inicio + self.tamanho_bloco]
+            for linha in self._executar('consulta_cnpj_basico', (bloco,)):
+                resultado[linha['cnpj_basico']].append(linha)
+            for chave in bloco:
+                self.cache.definir(('basico', chave), [dict(linha) for linha in resultado[chave]])
+
+        return resultado
+
+    def consultar_basico(self, cnpj_basico):
+        """
+        Consulta todos os estabelecimentos de um CNPJ básico (8 dígitos)
+        """
+        chave = normalizar_cnpj(cnpj_basico, digitos=8)
+        if chave is None:
+            return []
+        return self.consultar_basico_lote([chave])[chave]
+
+    def buscar_por_nome(self, termo, limite=20, origens=('razao_social', 'nome_fantasia')):
+        """
+        Busca empresas e estabelecimentos cujo nome contém o termo
+
+        A busca ignora acentos e maiúsculas/minúsculas e usa os índices trigram
+        criados após a carga. Os resultados são ordenados por similaridade.
+
+        Args:
+            termo: Texto a ser buscado
+            limite: Quantidade máxima de resultados
+            origens: Campos pesquisados ('razao_social' e/ou 'nome_fantasia')
+
+        Returns:
+            list: Resultados com cnpj_basico, cnpj (apenas para nome_fantasia),
+                  origem, nome e similaridade
+        """
+        termo_normalizado = normalizar_nome(termo.strip())
+        if not termo_normalizado:
+            return []
+        # Escapar curingas do LIKE presentes no próprio termo
+        padrao = '%' + _CURINGAS_LIKE.sub(r'\\\1', termo_normalizado) + '%'
+
+        resultados = []
+        for origem in origens:
+            resultados.extend(self._executar(
+                f'busca_{origem}', (termo_normalizado, padrao, limite), campos=CAMPOS_BUSCA
+            ))
+        resultados.sort(key=lambda r: r['similaridade'], reverse=True)
+        return resultados[:limite]
+
+    def fechar(self):
+        """
+        Fecha todas as conexões do pool
+        """
+        self.pool.closeall()
+
+def _criar_manipulador(consulta):
+    """
+    Cria a classe de manipulador HTTP ligada a uma instância de ConsultaCNPJ
+    """
+
+    class ManipuladorConsulta(BaseHTTPRequestHandler):
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo, default=str, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            partes = self.path.strip('/').split('/')
+            if len(partes) != 2:
+                self._responder(404, {'erro': 'Rota não encontrada'})
+            elif partes[0] == 'cnpj':
+                resultado = consulta.consultar(partes[1])
+                if resultado is None:
+                    self._responder(404, {'erro': 'CNPJ não encontrado'})
+                else:
+                    self._responder(200, resultado)
+            elif partes[0] == 'cnpj-basico':
+                self._responder(200, consulta.consultar_basico(partes[1]))
+            else:
+                self._responder(404, {'erro': 'Rota não encontrada'})
+
+        def do_POST(self):
+            try:
+                tamanho = int(self.headers.get('Content-Length', 0))
+                cnpjs = json.loads(self.rfile.read(tamanho) or b'[]')
+                if not isinstance(cnpjs, list):
+                    raise ValueError('o corpo deve ser uma lista de CNPJs')
+            except ValueError as e:
+                self._responder(400, {'erro': f'Corpo inválido: {e}'})
+                return
+
+            rota = self.path.strip('/')
+            if rota == 'cnpjs':
+                self._responder(200, consulta.consultar_lote(cnpjs))
+            elif rota == 'cnpjs-basicos':
+                self._responder(200, consulta.consultar_basico_lote(cnpjs))
+            else:
+                self._responder(404, {'erro': 'Rota não encontrada'})
+
+        def log_message(self, formato, *args):
+            logger.debug(formato % args)
+
+    return ManipuladorConsulta
+
+def servir_http(consulta, host='0.0.0.0', porta=8000):
+    """
+    Expõe as consultas em um servidor HTTP simples (JSON)
+
+    Rotas:
+        GET  /cnpj/<cnpj>                 -> dados de um CNPJ completo
+        GET  /cnpj-basico/<cnpj_basico>   -> estabelecimentos de um CNPJ básico
+        POST /cnpjs                       -> corpo: lista de CNPJs completos
+        POST /cnpjs-basicos               -> corpo: lista de CNPJs básicos
+    """
+    servidor = ThreadingHTTPServer((host, porta), _criar_manipulador(consulta))
+    logger.info(f"Servidor de consultas ouvindo em http://{host}:{porta}")
+    try:
+        servidor.serve_forever()
+    finally:
+        servidor.server_close()
+
+# Executar
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Servidor HTTP de consulta de CNPJ')
+    parser.add_argument('--host', default='0.0.0.0', help='Endereço de escuta')
+    parser.add_argument('--porta', type=int, default=8000, help='Porta de escuta')
+    parser.add_argument('--max-conexoes', type=int, default=4, help='Tamanho máximo do pool de conexões')
+    args = parser.parse_args()
+
+    consulta = ConsultaCNPJ(max_conexoes=args.max_conexoes)
+    try:
+        servir_http(consulta, args.host, args.porta)
+    finally:
+        consulta.fechar()
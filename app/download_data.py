@@ -10,8 +10,10 @@ base_url = "https://arquivos.receitafederal.gov.br/dados/cnpj/dados_abertos_cnpj
 output_dir = "./dados_cnpj_2025-05"
 os.makedirs(output_dir, exist_ok=True)
 
-# Função para baixar todos os arquivos .zip com "Empresas" e "Estabelecimentos" no nome
-def baixar_arquivos_cnpj(base_url, destino, tipos=['Empresas', 'Estabelecimentos']):
+# Função para baixar todos os arquivos .zip com "Empresas", "Estabelecimentos" ou o nome
+# de uma das tabelas de códigos (CNAEs, municípios, naturezas jurídicas etc.)
+def baixar_arquivos_cnpj(base_url, destino, tipos=['Empresas', 'Estabelecimentos', 'Cnaes', 'Motivos',
+                                                  'Municipios', 'Naturezas', 'Paises', 'Qualificacoes']):
     print(f"\n🔍 Acessando {base_url}")
     response = requests.get(base_url)
     response.raise_for_status()
@@ -80,7 +82,7 @@ def baixar_arquivos_cnpj(base_url, destino, tipos=['Empresas', 'Estabelecimentos
 
 # Executar
 if __name__ == "__main__":
-    # Por padrão, baixa arquivos de Empresas e Estabelecimentos
+    # Por padrão, baixa arquivos de Empresas, Estabelecimentos e as tabelas de códigos
     baixar_arquivos_cnpj(base_url, output_dir)
     
     # Para baixar apenas um tipo específico, descomente e use uma das linhas abaixo:
@@ -0,0 +1,325 @@
+import os
+import re
+import sys
+import mmap
+import heapq
+import shutil
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+
+# Formato do arquivo (inteiros little-endian):
+#   cabeçalho (64 bytes): assinatura, quantidade, posições das seções, tamanho dos nomes dos campos
+#                         e quantidade de dígitos das chaves (14 para CNPJ, 8 para CNPJ básico)
+#   nomes dos campos (UTF-8, separados por \x1f), completados até múltiplo de 8 bytes
+#   chaves: quantidade x uint64, em ordem crescente (CNPJ como inteiro)
+#   posições: (quantidade + 1) x uint64, início de cada registro na seção de registros
+#   registros: valores dos campos em UTF-8, separados por \x1f
+ASSINATURA = b'CNPJIDX2'
+_CABECALHO = struct.Struct('<8sQQQQQQ')
+TAMANHO_CABECALHO = 64
+
+# limpar_string remove \x1f dos valores, então ele pode ser usado como separador
+SEPARADOR = '\x1f'
+
+_REGISTRO_BLOCO = struct.Struct('<QI')
+
+# Memória ocupada por um registro em um bloco, além dos bytes dos valores:
+# tupla (chave, registro), inteiro da chave, cabeçalho do bytes e posição na lista
+_CUSTO_REGISTRO = sys.getsizeof((0, b'')) + sys.getsizeof(10 ** 13) + sys.getsizeof(b'') + 8
+_NAO_DIGITOS = re.compile(r'\D')
+
+def _alinhar(posicao, alinhamento=8):
+    return (posicao + alinhamento - 1) // alinhamento * alinhamento
+
+def _chave(cnpj, digitos_chave):
+    """
+    Converte um CNPJ (com ou sem máscara) para a chave inteira do índice
+
+    Retorna None se o CNPJ não tiver exatamente `digitos_chave` dígitos: como
+    a chave é um inteiro, "44778741" e "00000044778741" seriam a mesma chave.
+    """
+    digitos = _NAO_DIGITOS.sub('', str(cnpj))
+    return int(digitos) if len(digitos) == digitos_chave else None
+
+def _ler_bloco(caminho):
+    """
+    Lê um bloco ordenado gravado por EscritorIndiceCNPJ._despejar
+    """
+    with open(caminho, 'rb') as f:
+        while True:
+            cabecalho = f.read(_REGISTRO_BLOCO.size)
+            if not cabecalho:
+                return
+            chave, tamanho = _REGISTRO_BLOCO.unpack(cabecalho)
+            yield chave, f.read(tamanho)
+
+class EscritorIndiceCNPJ:
+    """
+    Gera o arquivo de índice a partir dos registros do parse.
+
+    Os registros são acumulados em blocos ordenados gravados em arquivos
+    temporários e, ao final, intercalados (ordenação externa), de modo que a
+    memória usada não depende do tamanho da base.
+    """
+
+    def __init__(self, caminho, campos, digitos_chave=14, bytes_por_bloco=32 * 1024 * 1024):
+        """
+        Args:
+            caminho: Caminho do arquivo de índice a ser gerado
+            campos: Nomes dos campos de cada registro
+            digitos_chave: Quantidade de dígitos das chaves (14 para o CNPJ
+                           completo, 8 para o CNPJ básico)
+            bytes_por_bloco: Memória aproximada, em bytes, ocupada pelos registros
+                             mantidos antes de gravar um bloco ordenado
+        """
+        self.caminho = caminho
+        self.campos = tuple(campos)
+        self.digitos_chave = digitos_chave
+        self.bytes_por_bloco = bytes_por_bloco
+        self._pasta_temporaria = tempfile.mkdtemp(
+            prefix='indice_cnpj_', dir=os.path.dirname(os.path.abspath(caminho))
+        )
+        self._blocos = []
+        self._registros = []
+        self._bytes_registros = 0
+
+    def adicionar(self, cnpj, valores):
+        """
+        Adiciona um registro ao índice
+
+        Args:
+            cnpj: CNPJ (apenas dígitos) usado como chave
+            valores: Valores dos campos, na mesma ordem de campos
+
+        Returns:
+            bool: False se o CNPJ não for numérico com digitos_chave dígitos
+                  e o registro foi ignorado
+        """
+        if len(cnpj) != self.digitos_chave or not cnpj.isascii() or not cnpj.isdigit():
+            return False
+        registro = SEPARADOR.join('' if v is None else str(v) for v in valores).encode('utf-8')
+        self._registros.append((int(cnpj), registro))
+        self._bytes_registros += _CUSTO_REGISTRO + len(registro)
+        if self._bytes_registros >= self.bytes_por_bloco:
+            self._despejar()
+        return True
+
+    def _despejar(self):
+        if not self._registros:
+            return
+        self._registros.sort(key=lambda item: item[0])
+        caminho_bloco = os.path.join(self._pasta_temporaria, f'bloco_{len(self._blocos):05d}')
+        with open(caminho_bloco, 'wb', buffering=1024 * 1024) as f:
+            for chave, registro in self._registros:
+                f.write(_REGISTRO_BLOCO.pack(chave, len(registro)))
+                f.write(registro)
+        self._blocos.append(caminho_bloco)
+        self._registros = []
+        self._bytes_registros = 0
+
+    def finalizar(self):
+        """
+        Intercala os blocos e grava o arquivo de índice final
+
+        O arquivo é montado em um temporário e renomeado ao final, de forma que
+        leitores nunca vejam um índice incompleto. Em caso de CNPJ repetido,
+        prevalece o primeiro registro.
+
+        Returns:
+            int: Quantidade de registros no índice
+        """
+        try:
+            self._despejar()
+            caminho_chaves = os.path.join(self._pasta_temporaria, 'chaves')
+            caminho_posicoes = os.path.join(self._pasta_temporaria, 'posicoes')
+            caminho_registros = os.path.join(self._pasta_temporaria, 'registros')
+
+            quantidade = 0
+            posicao = 0
+            ultima_chave = None
+            with open(caminho_chaves, 'wb') as f_chaves, \
+                    open(caminho_posicoes, 'wb') as f_posicoes, \
+                    open(caminho_registros, 'wb', buffering=1024 * 1024) as f_registros:
+                chaves = array('Q')
+                posicoes = array('Q')
+                intercalados = heapq.merge(*(_ler_bloco(b) for b in self._blocos), key=lambda item: item[0])
+                for chave, registro in intercalados:
+                    if chave == ultima_chave:
+                        continue
+                    ultima_chave = chave
+                    chaves.append(chave)
+                    posicoes.append(posicao)
+                    f_registros.write(registro)
+                    posicao += len(registro)
+                    quantidade += 1
+                    if len(chaves) >= 65536:
+                        self._gravar_inteiros(f_chaves, chaves)
+                        self._gravar_inteiros(f_posicoes, posicoes)
+                        chaves = array('Q')
+                        posicoes = array('Q')
+                posicoes.append(posicao)
+                self._gravar_inteiros(f_chaves, chaves)
+                self._gravar_inteiros(f_posicoes, posicoes)
+
+            nomes_campos = SEPARADOR.join(self.campos).encode('utf-8')
+            offset_chaves = _alinhar(TAMANHO_CABECALHO + len(nomes_campos))
+            offset_posicoes = offset_chaves + 8 * quantidade
+            offset_registros = offset_posicoes + 8 * (quantidade + 1)
+
+            caminho_temporario = f'{self.caminho}.tmp'
+            with open(caminho_temporario, 'wb') as f:
+                f.write(_CABECALHO.pack(
+                    ASSINATURA, quantidade, offset_chaves, offset_posicoes,
+                    offset_registros, len(nomes_campos), self.digitos_chave
+                ).ljust(TAMANHO_CABECALHO, b'\0'))
+                f.write(nomes_campos.ljust(offset_chaves - TAMANHO_CABECALHO, b'\0'))
+                for caminho_secao in (caminho_chaves, caminho_posicoes, caminho_registros):
+                    with open(caminho_secao, 'rb') as secao:
+                        shutil.copyfileobj(secao, f, 16 * 1024 * 1024)
+            os.replace(caminho_temporario, self.caminho)
+            return quantidade
+        finally:
+            shutil.rmtree(self._pasta_temporaria, ignore_errors=True)
+
+    @staticmethod
+    def _gravar_inteiros(f, valores):
+        if sys.byteorder != 'little':
+            valores.byteswap()
+        valores.tofile(f)
+
+class LeitorIndiceCNPJ:
+    """
+    Consulta um arquivo de índice gerado por EscritorIndiceCNPJ.
+
+    O arquivo é mapeado em memória (mmap) somente para leitura: a abertura só
+    lê o cabeçalho, as páginas são compartilhadas entre processos pelo cache
+    do sistema operacional e as buscas binárias acessam as chaves diretamente
+    no mapeamento, sem copiá-las.
+    """
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, 'rb')
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (assinatura, self.quantidade, offset_chaves, offset_posicoes,
+         offset_registros, tamanho_campos, self.digitos_chave) = _CABECALHO.unpack_from(self._mapa, 0)
+        if assinatura != ASSINATURA:
+            self.fechar()
+            raise ValueError(f"Arquivo de índice inválido: {caminho}")
+
+        self.campos = tuple(
+            self._mapa[TAMANHO_CABECALHO:TAMANHO_CABECALHO + tamanho_campos].decode('utf-8').split(SEPARADOR)
+        )
+        visao = memoryview(self._mapa)
+        self._chaves = visao[offset_chaves:offset_posicoes].cast('Q')
+        self._posicoes = visao[offset_posicoes:offset_registros].cast('Q')
+        self._registros = visao[offset_registros:]
+        if sys.byteorder != 'little':
+            # Sem acesso direto em máquinas big-endian: converte as seções para a ordem nativa
+            self._chaves = array('Q', self._chaves.tobytes())
+            self._chaves.byteswap()
+            self._posicoes = array('Q', self._posicoes.tobytes())
+            self._posicoes.byteswap()
+
+    def __len__(self):
+        return self.quantidade
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+    def _localizar(self, chave, inicio=0):
+        posicao = bisect_left(self._chaves, chave, inicio)
+        if posicao < self.quantidade and self._chaves[posicao] == chave:
+            return posicao
+        return None
+
+    def _registro(self, posicao):
+        return self._registros[self._posicoes[posicao]:self._posicoes[posicao + 1]]
+
+    def _decodificar(self, registro):
+        return dict(zip(self.campos, str(registro, 'utf-8').split(SEPARADOR)))
+
+    def buscar_bruto(self, cnpj):
+        """
+        Retorna o registro do CNPJ sem decodificá-lo
+
+        A memoryview continua válida depois de fechar(): nesse caso o
+        mapeamento só é liberado quando ela for descartada (ou liberada
+        com release()).
+
+        Returns:
+            memoryview sobre os bytes do registro no arquivo mapeado, ou None
+        """
+        chave = _chave(cnpj, self.digitos_chave)
+        posicao = None if chave is None else self._localizar(chave)
+        return None if posicao is None else self._registro(posicao)
+
+    def buscar(self, cnpj):
+        """
+        Busca um CNPJ no índice
+
+        Returns:
+            dict com os campos do registro, ou None se o CNPJ não estiver no índice
+            ou não tiver a quantidade de dígitos das chaves
+        """
+        registro = self.buscar_bruto(cnpj)
+        return None if registro is None else self._decodificar(registro)
+
+    def buscar_lote(self, cnpjs):
+        """
+        Busca vários CNPJs, percorrendo as chaves em ordem crescente
+
+        Returns:
+            dict: CNPJ informado -> dict com os campos do registro (ou None)
+        """
+        resultado = {}
+        chaves = []
+        for cnpj in cnpjs:
+            resultado[cnpj] = None
+            chave = _chave(cnpj, self.digitos_chave)
+            if chave is not None:
+                chaves.append((chave, cnpj))
+        chaves.sort()
+
+        inicio = 0
+        for chave, cnpj in chaves:
+            posicao = bisect_left(self._chaves, chave, inicio)
+            inicio = posicao
+            if posicao < self.quantidade and self._chaves[posicao] == chave:
+                resultado[cnpj] = self._decodificar(self._registro(posicao))
+        return resultado
+
+    def fechar(self):
+        """
+        Libera o mapeamento e fecha o arquivo
+
+        Se ainda houver memoryviews retornadas por buscar_bruto em uso, o
+        mapeamento é liberado apenas quando a última delas for descartada.
+        """
+        for atributo in ('_chaves', '_posicoes', '_registros'):
+            visao = getattr(self, atributo, None)
+            if isinstance(visao, memoryview):
+                visao.release()
+        if self._mapa is not None:
+            try:
+                self._mapa.close()
+            except BufferError:
+                # Há memoryviews exportadas; o mmap é fechado pelo coletor de lixo
+                pass
+            self._mapa = None
+        self._arquivo.close()
+
+# Executar
+if __name__ == "__main__":
+    import json
+
+    if len(sys.argv) < 3:
+        print("Uso: python -m app.indice_cnpj <arquivo_indice> <cnpj> [<cnpj> ...]")
+        sys.exit(1)
+
+    with LeitorIndiceCNPJ(sys.argv[1]) as leitor:
+        print(json.dumps(leitor.buscar_lote(sys.argv[2:]), ensure_ascii=False, indent=2))
@@ -0,0 +1,284 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger('lote')
+
+# Tabela de escape do formato texto do COPY do PostgreSQL
+_TABELA_ESCAPE_COPY = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+def formatar_linha_copy(valores):
+    """
+    Converte uma sequência de valores em uma linha no formato texto do COPY
+
+    Args:
+        valores: Sequência de valores (strings, números ou None)
+
+    Returns:
+        Bytes UTF-8 da linha, terminada em quebra de linha
+    """
+    campos = []
+    for valor in valores:
+        if valor is None:
+            campos.append("")
+        elif isinstance(valor, str):
+            campos.append(valor.translate(_TABELA_ESCAPE_COPY))
+        else:
+            campos.append(str(valor))
+    return ('\t'.join(campos) + '\n').encode('utf-8')
+
+class LeitorMemoria:
+    """
+    Objeto arquivo somente leitura sobre um buffer em memória.
+
+    Diferente de io.BytesIO, não copia o buffer: cada read() copia apenas o
+    trecho pedido pelo COPY a partir de uma memoryview.
+    """
+
+    def __init__(self, dados):
+        self._visao = memoryview(dados)
+        self._posicao = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, tamanho=-1):
+        inicio = self._posicao
+        if tamanho is None or tamanho < 0:
+            fim = len(self._visao)
+        else:
+            fim = min(inicio + tamanho, len(self._visao))
+        self._posicao = fim
+        return bytes(self._visao[inicio:fim])
+
+    def close(self):
+        # Libera a memoryview para que o buffer possa voltar a ser redimensionado
+        self._visao.release()
+
+class ErroEnvioLote(Exception):
+    """
+    Falha ao enviar um lote ao banco.
+
+    Diferente de um erro em uma linha do CSV, ela deve interromper a carga,
+    pois os registros do lote não foram gravados.
+    """
+
+class LoteAdaptativo:
+    """
+    Buffer compacto de registros para carga em massa via COPY.
+
+    Os registros são serializados diretamente em um bytearray no formato texto
+    do COPY, em vez de uma lista de tuplas. O tamanho do lote é medido em bytes
+    e ajustado a cada descarga a partir do tempo observado, buscando a latência
+    alvo de commit sem ultrapassar o orçamento de memória.
+    """
+
+    def __init__(self, orcamento_bytes=64 * 1024 * 1024, latencia_alvo=2.0,
+                 limite_minimo=1024 * 1024, limite_linhas=None):
+        """
+        Args:
+            orcamento_bytes: Tamanho máximo do buffer em bytes
+            latencia_alvo: Tempo alvo (em segundos) para cada descarga/commit
+            limite_minimo: Tamanho mínimo do lote em bytes
+            limite_linhas: Limite opcional de linhas por lote
+        """
+        self.orcamento_bytes = orcamento_bytes
+        self.latencia_alvo = latencia_alvo
+        self.limite_minimo = min(limite_minimo, orcamento_bytes)
+        self.limite_linhas = limite_linhas
+        # Começa com um quarto do orçamento e se ajusta com as medições
+        self.limite_bytes = max(self.limite_minimo, orcamento_bytes // 4)
+        self.linhas = 0
+        self._buffer = bytearray()
+
+    def __len__(self):
+        return self.linhas
+
+    @property
+    def tamanho_bytes(self):
+        return len(self._buffer)
+
+    def adicionar(self, valores):
+        """
+        Serializa e adiciona um registro ao buffer
+        """
+        self._buffer += formatar_linha_copy(valores)
+        self.linhas += 1
+
+    def cheio(self):
+        """
+        Retorna True se o lote atingiu o limite atual de bytes ou de linhas
+        """
+        if len(self._buffer) >= self.limite_bytes:
+            return True
+        return bool(self.limite_linhas) and self.linhas >= self.limite_linhas
+
+    def descarregar(self, enviar=None):
+        """
+        Envia o conteúdo do buffer e reajusta o tamanho do lote
+
+        Args:
+            enviar: Função que recebe um objeto arquivo com os dados no formato
+                    do COPY. Se None, os dados são apenas descartados (dry_run)
+
+        Returns:
+            int: Quantidade de registros descarregados
+
+        Raises:
+            ErroEnvioLote: Se o envio falhar. Nesse caso o buffer é mantido
+        """
+        linhas = self.linhas
+        if linhas and enviar is not None:
+            inicio = time.perf_counter()
+            try:
+                with LeitorMemoria(self._buffer) as arquivo:
+                    enviar(arquivo)
+            except Exception as e:
+                raise ErroEnvioLote(f"Falha no envio de lote de {linhas} registros: {e}") from e
+            self.registrar_envio(len(self._buffer), time.perf_counter() - inicio)
+        self.retirar()
+        return linhas
+
+    def retirar(self):
+        """
+        Retira o conteúdo do buffer sem enviá-lo, deixando o lote vazio
+
+        Returns:
+            tuple: (dados, linhas) com os bytes no formato do COPY e a quantidade de registros
+        """
+        dados, linhas = self._buffer, self.linhas
+        self._buffer = bytearray()
+        self.linhas = 0
+        return dados, linhas
+
+    def registrar_envio(self, tamanho, segundos):
+        """
+        Recalcula o limite de bytes a partir da vazão observada em um envio
+        """
+        if segundos <= 0:
+            return
+        ideal = tamanho / segundos * self.latencia_alvo
+        # Média entre o limite atual e o ideal para suavizar oscilações
+        novo_limite = int((self.limite_bytes + ideal) / 2)
+        self.limite_bytes = max(self.limite_minimo, min(self.orcamento_bytes, novo_limite))
+        logger.debug(
+            f"Lote de {tamanho} bytes enviado em {segundos:.2f}s; "
+            f"novo limite: {self.limite_bytes} bytes"
+        )
+
+class EnvioParalelo:
+    """
+    Envia lotes em paralelo, cada thread com a sua própria conexão.
+
+    Os lotes na fila ou em envio são contados em bytes: enquanto o total
+    ultrapassar o orçamento, um novo envio aguarda o término dos anteriores.
+    Os registros só são contabilizados depois que o envio do lote é confirmado.
+    """
+
+    def __init__(self, abrir_conexao, paralelismo=4, orcamento_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            abrir_conexao: Função sem argumentos que abre uma nova conexão
+            paralelismo: Quantidade de threads de envio
+            orcamento_bytes: Total máximo, em bytes, dos lotes na fila ou em envio
+        """
+        self._abrir_conexao = abrir_conexao
+        self._executor = ThreadPoolExecutor(max_workers=paralelismo)
+        self._local = threading.local()
+        self._conexoes = []
+        self._trava = threading.Lock()
+        self._pendentes = {}
+        self._bytes_pendentes = 0
+        self._confirmados = 0
+        self.orcamento_bytes = orcamento_bytes
+
+    def _conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._abrir_conexao()
+            self._local.conn = conn
+            with self._trava:
+                self._conexoes.append(conn)
+        return conn
+
+    def _aguardar(self, limite_bytes):
+        """
+        Aguarda até os envios pendentes somarem no máximo `limite_bytes`,
+        contabilizando os registros dos envios concluídos. Todos os erros dos
+        envios concluídos são registrados, e o primeiro é propagado como ErroEnvioLote.
+        """
+        erro = None
+        while self._pendentes and self._bytes_pendentes > limite_bytes and erro is None:
+            concluidos, _ = wait(self._pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                self._bytes_pendentes -= self._pendentes.pop(futuro)
+                try:
+                    self._confirmados += futuro.result()
+                except Exception as e:
+                    logger.error(f"Falha no envio de lote: {e}")
+                    erro = erro or e
+        if erro is not None:
+            raise ErroEnvioLote(f"Falha no envio de lote: {erro}") from erro
+
+    def _retirar_confirmados(self):
+        confirmados, self._confirmados = self._confirmados, 0
+        return confirmados
+
+    def enviar(self, lote, funcao):
+        """
+        Retira os dados do lote e agenda funcao(conn, dados) em uma das threads
+
+        Antes de retirar os dados, aguarda espaço no orçamento da fila; se um
+        envio anterior falhou, o erro é propagado e o lote continua intacto.
+
+        Args:
+            lote: LoteAdaptativo a ser descarregado
+            funcao: Função que recebe a conexão da thread e o objeto arquivo com os dados
+
+        Returns:
+            int: Quantidade de registros com envio confirmado desde a chamada anterior
+        """
+        if lote.linhas:
+            self._aguardar(self.orcamento_bytes - lote.tamanho_bytes)
+            dados, linhas = lote.retirar()
+
+            def tarefa():
+                inicio = time.perf_counter()
+                with LeitorMemoria(dados) as arquivo:
+                    funcao(self._conexao(), arquivo)
+                lote.registrar_envio(len(dados), time.perf_counter() - inicio)
+                return linhas
+
+            self._pendentes[self._executor.submit(tarefa)] = len(dados)
+            self._bytes_pendentes += len(dados)
+        return self._retirar_confirmados()
+
+    def finalizar(self):
+        """
+        Aguarda todos os envios pendentes
+
+        Returns:
+            int: Quantidade de registros com envio confirmado desde a chamada anterior
+        """
+        self._aguardar(0)
+        return self._retirar_confirmados()
+
+    def fechar(self):
+        """
+        Cancela os envios ainda na fila, aguarda os que estão em andamento e
+        fecha as conexões das threads
+        """
+        for futuro in self._pendentes:
+            futuro.cancel()
+        self._executor.shutdown(wait=True)
+        for conn in self._conexoes:
+            conn.close()
@@ -2,10 +2,14 @@ import os
 import argparse
 import logging
 from dotenv import load_dotenv
-from app.database import testar_conexao
+from app.database import (
+    testar_conexao, inicializar_banco_dados, remover_indices_busca,
+    criar_indices_pos_carga, existe_cnpj_completo, construir_cnpj_completo, registrar_carga
+)
 from app.download_data import baixar_arquivos_cnpj
 from app.unzip_data import extrair_arquivos
 from app.parse_csv import processar_csv_para_postgres, processar_estabelecimentos_csv
+from app.tabelas_codigo import PADROES_TABELAS_CODIGO, carregar_tabelas_codigo, salvar_tabelas_codigo
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +24,7 @@ def main():
     
     Este script orquestra o processo completo:
     1. Download dos arquivos ZIP da Receita Federal
-    2. Extração dos arquivos EMPRECSV dos ZIPs
+    2. Extração dos arquivos EMPRECSV, ESTABELE e das tabelas de códigos dos ZIPs
     3. Processamento dos arquivos CSV e carregamento no banco de dados PostgreSQL
     """
     # Configuração de diretórios
@@ -54,6 +58,18 @@ def main():
     parser.add_argument('--skip-empresas', action='store_true', help='Pular a inserção de empresas no banco de dados')
     parser.add_argument('--skip-estabelecimentos', action='store_true', help='Pular a inserção de estabelecimentos no banco de dados')
     parser.add_argument('--pausar-erro', action='store_true', help='Pausar após cada erro para permitir a interação do usuário')
+    parser.add_argument('--validar-codigos', action='store_true', help='Informar códigos (CNAE, natureza jurídica, qualificação) que não existem nas tabelas de códigos')
+    parser.add_argument('--validar-cnpj', action='store_true', help='Validar os dígitos verificadores e descartar CNPJs repetidos antes da inserção')
+    parser.add_argument('--pasta-quarentena', default='./quarentena', help='Diretório onde os estabelecimentos rejeitados pela validação são gravados')
+    parser.add_argument('--indice-empresas', help='Gerar também um arquivo de índice de empresas (consulta sem banco) neste caminho')
+    parser.add_argument('--indice-estabelecimentos', help='Gerar também um arquivo de índice de estabelecimentos (consulta sem banco) neste caminho')
+    parser.add_argument('--skip-indices', action='store_true', help='Pular a criação dos índices trigram de busca por nome (os índices de CNPJ e UF da tabela particionada são sempre criados)')
+    parser.add_argument('--construir-cnpj-completo', action='store_true', help='Construir a tabela desnormalizada cnpj_completo após a carga (depois de criada, ela é reconstruída em todas as cargas)')
+    parser.add_argument('--paralelismo', type=int, default=4, help='Quantidade de conexões/workers paralelos na carga e nas etapas pós-carga')
+    parser.add_argument('--particionamento', choices=['uf', 'hash'], help='Criar a tabela estabelecimentos particionada por UF ou por hash do CNPJ básico')
+    parser.add_argument('--num-particoes', type=int, default=16, help='Quantidade de partições no particionamento por hash')
+    parser.add_argument('--orcamento-memoria-mb', type=int, default=64, help='Memória máxima, em MB, dos lotes de inserção (inclusive os que aguardam o envio paralelo)')
+    parser.add_argument('--latencia-alvo', type=float, default=2.0, help='Tempo alvo, em segundos, de cada commit de lote')
     args = parser.parse_args()
     
     # Etapa 1: Download dos arquivos
@@ -65,11 +81,13 @@ def main():
     else:
         print("\n📥 ETAPA 1: DOWNLOAD DOS ARQUIVOS [PULADO]")
     
-    # Etapa 2: Extração dos arquivos EMPRECSV e ESTABELE
+    # Etapa 2: Extração dos arquivos EMPRECSV, ESTABELE e das tabelas de códigos
     if not args.skip_extract:
         print("\n📦 ETAPA 2: EXTRAÇÃO DOS ARQUIVOS DE EMPRESAS E ESTABELECIMENTOS")
         print("=" * 50)
-        arquivos_por_tipo = extrair_arquivos(caminho_zips, caminho_extraidos, ["EMPRECSV", "ESTABELE"])
+        arquivos_por_tipo = extrair_arquivos(
+            caminho_zips, caminho_extraidos, ["EMPRECSV", "ESTABELE", *PADROES_TABELAS_CODIGO.values()]
+        )
         print(f"Total de arquivos extraídos: {sum(len(arquivos) for arquivos in arquivos_por_tipo.values())}")
         for tipo, arquivos in arquivos_por_tipo.items():
             print(f"   - {len(arquivos)} arquivos {tipo}")
@@ -81,15 +99,40 @@ def main():
         print("\n💽 ETAPA 3: PROCESSAMENTO DOS DADOS E CARREGAMENTO NO BANCO PostgreSQL")
         print("=" * 50)
         
+        orcamento_memoria = args.orcamento_memoria_mb * 1024 * 1024
+        
         total_empresas = 0
         total_estabelecimentos = 0
         arquivos_empresas = []
         arquivos_estabelecimentos = []
         
+        # Criar as tabelas (com o particionamento escolhido, se ainda não existirem)
+        conn = inicializar_banco_dados(conexao_str, args.particionamento, args.num_particoes)
+        try:
+            # Carregar as tabelas de códigos em memória (para as descrições) e no banco
+            print("\n   📚 Carregando tabelas de códigos...")
+            tabelas_codigo = carregar_tabelas_codigo(caminho_extraidos)
+            if tabelas_codigo:
+                salvar_tabelas_codigo(conn, tabelas_codigo)
+            else:
+                print("   ⚠️ Nenhuma tabela de códigos encontrada; as descrições ficarão vazias")
+            
+            # Os índices de busca por nome são recriados após a carga; removê-los antes
+            # evita que cada COPY precise atualizá-los
+            if not args.skip_indices:
+                remover_indices_busca(conn)
+        finally:
+            conn.close()
+        
         # Processar empresas (se não for para pular)
         if not args.skip_empresas:
             print("\n   🏢 Processando dados de EMPRESAS...")
-            total_empresas, arquivos_empresas = processar_csv_para_postgres(caminho_extraidos, conexao_str, dry_run=False)
+            total_empresas, arquivos_empresas = processar_csv_para_postgres(
+                caminho_extraidos, conexao_str, dry_run=False,
+                orcamento_memoria=orcamento_memoria, latencia_alvo=args.latencia_alvo,
+                tabelas_codigo=tabelas_codigo, validar_codigos=args.validar_codigos,
+                arquivo_indice=args.indice_empresas
+            )
             print(f"   ✅ Total de registros de empresas: {total_empresas}")
             print(f"   ✅ Arquivos de empresas processados: {len(arquivos_empresas)}")
         else:
@@ -98,7 +141,14 @@ def main():
         # Processar estabelecimentos (se não for para pular)
         if not args.skip_estabelecimentos:
             print("\n   🏪 Processando dados de ESTABELECIMENTOS...")
-            total_estabelecimentos, arquivos_estabelecimentos = processar_estabelecimentos_csv(caminho_extraidos, conexao_str, dry_run=False)
+            total_estabelecimentos, arquivos_estabelecimentos = processar_estabelecimentos_csv(
+                caminho_extraidos, conexao_str, dry_run=False,
+                orcamento_memoria=orcamento_memoria, latencia_alvo=args.latencia_alvo,
+                tabelas_codigo=tabelas_codigo, validar_codigos=args.validar_codigos,
+                paralelismo=args.paralelismo,
+                validar_cnpj=args.validar_cnpj, pasta_quarentena=args.pasta_quarentena,
+                arquivo_indice=args.indice_estabelecimentos
+            )
             print(f"   ✅ Total de registros de estabelecimentos: {total_estabelecimentos}")
             print(f"   ✅ Arquivos de estabelecimentos processados: {len(arquivos_estabelecimentos)}")
         else:
@@ -109,6 +159,32 @@ def main():
         total_registros = total_empresas + total_estabelecimentos
         total_arquivos = len(arquivos_empresas) + len(arquivos_estabelecimentos)
         print(f"\n📊 TOTAL GERAL: {total_registros} registros em {total_arquivos} arquivos")
+        
+        # Criar índices pós-carga e registrar a nova geração dos dados (invalida caches de consulta).
+        # Os índices de busca são recriados mesmo sem arquivos, pois foram removidos antes da carga;
+        # --skip-indices não pula os índices de CNPJ e UF da tabela particionada
+        if total_arquivos or not args.skip_indices:
+            conn = inicializar_banco_dados(conexao_str)
+            try:
+                if args.skip_indices:
+                    print("\n   🔎 Criando índices pós-carga (sem busca por nome)...")
+                else:
+                    print("\n   🔎 Criando índices pós-carga (CNPJ, UF e busca por nome)...")
+                criar_indices_pos_carga(conn, conexao_str, args.paralelismo, indices_busca=not args.skip_indices)
+                if total_arquivos:
+                    # Uma vez criada, a tabela é reconstruída a cada carga para não ficar desatualizada
+                    if args.construir_cnpj_completo or existe_cnpj_completo(conn):
+                        print("\n   🧩 Construindo tabela desnormalizada cnpj_completo...")
+                        construir_cnpj_completo(conn, args.paralelismo)
+                    # A carga substitui a anterior nas tabelas que recarregou
+                    tabelas_substituidas = [
+                        tabela for tabela, total in
+                        (('empresas', total_empresas), ('estabelecimentos', total_estabelecimentos))
+                        if total
+                    ]
+                    registrar_carga(conn, tabelas_substituidas)
+            finally:
+                conn.close()
     else:
         print("\n💽 ETAPA 3: PROCESSAMENTO DOS DADOS E CARREGAMENTO NO BANCO [PULADO]")
     
@@ -0,0 +1,56 @@
+import os
+import csv
+import sys
+from app.database import inserir_tabela_codigo
+
+# Padrão do nome do arquivo extraído de cada tabela de códigos publicada pela Receita
+PADROES_TABELAS_CODIGO = {
+    'cnaes': 'CNAECSV',
+    'motivos': 'MOTICSV',
+    'municipios': 'MUNICCSV',
+    'naturezas': 'NATJUCSV',
+    'paises': 'PAISCSV',
+    'qualificacoes': 'QUALSCSV',
+}
+
+def carregar_tabelas_codigo(diretorio_csv):
+    """
+    Carrega as tabelas de códigos (CNAE, município, natureza jurídica etc.) em memória
+
+    Args:
+        diretorio_csv: Diretório com os arquivos extraídos
+
+    Returns:
+        dict: Nome da tabela -> dicionário {código: descrição}. Tabelas cujo
+              arquivo não foi encontrado ficam de fora do resultado.
+    """
+    tabelas = {}
+    arquivos = os.listdir(diretorio_csv)
+
+    for tabela, padrao in PADROES_TABELAS_CODIGO.items():
+        for arquivo in arquivos:
+            if not arquivo.upper().endswith(padrao):
+                continue
+
+            codigos = tabelas.setdefault(tabela, {})
+            with open(os.path.join(diretorio_csv, arquivo), 'r', encoding='latin-1') as f:
+                for linha in csv.reader(f, delimiter=';', quotechar='"'):
+                    if len(linha) >= 2:
+                        # Strings internadas para não manter cópias repetidas em memória
+                        codigos[sys.intern(linha[0].strip())] = sys.intern(linha[1].strip())
+
+        if tabela in tabelas:
+            print(f"📚 Tabela de códigos '{tabela}' carregada: {len(tabelas[tabela])} códigos")
+
+    return tabelas
+
+def salvar_tabelas_codigo(conn, tabelas):
+    """
+    Grava no banco as tabelas de códigos carregadas por carregar_tabelas_codigo
+
+    Args:
+        conn: Conexão com o banco de dados
+        tabelas: Dicionário retornado por carregar_tabelas_codigo
+    """
+    for tabela, codigos in tabelas.items():
+        inserir_tabela_codigo(conn, tabela, codigos)
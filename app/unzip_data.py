@@ -1,14 +1,122 @@
 import os
+import re
+import zlib
+import shutil
 import zipfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-def extrair_arquivos(pasta_zips, pasta_saida="./extraidos", padroes=["EMPRECSV", "ESTABELE"]):
+# Tamanho do buffer de cópia na extração e no cálculo do CRC (16 MB)
+TAMANHO_BUFFER = 16 * 1024 * 1024
+
+def _obter_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# Permissões dos arquivos extraídos: as de um arquivo criado normalmente (como em
+# ZipFile.extract), já que mkstemp cria o temporário acessível só ao dono (0600)
+MODO_ARQUIVO = 0o666 & ~_obter_umask()
+
+def _crc32_arquivo(caminho):
+    """
+    Calcula o CRC32 de um arquivo, lendo-o em blocos
+    """
+    crc = 0
+    with open(caminho, 'rb') as f:
+        while bloco := f.read(TAMANHO_BUFFER):
+            crc = zlib.crc32(bloco, crc)
+    return crc
+
+def _ja_extraido(caminho, info):
+    """
+    Verifica se o arquivo já extraído tem o mesmo tamanho e CRC32 do membro do ZIP
+    """
+    return (
+        os.path.isfile(caminho)
+        and os.path.getsize(caminho) == info.file_size
+        and _crc32_arquivo(caminho) == info.CRC
+    )
+
+def _caminho_destino(pasta_saida, nome_membro):
+    """
+    Monta o caminho de extração, descartando componentes absolutos ou '..'
+    (mesma proteção aplicada por ZipFile.extract)
+    """
+    partes = [parte for parte in nome_membro.split('/') if parte not in ('', '.', '..')]
+    return os.path.join(pasta_saida, *partes)
+
+def _extrair_membro(zip_ref, info, caminho):
+    """
+    Extrai um membro para um arquivo temporário e o renomeia ao final, para que
+    uma extração interrompida nunca deixe um arquivo parcial no destino
+    """
+    pasta = os.path.dirname(caminho)
+    os.makedirs(pasta, exist_ok=True)
+    descritor, caminho_temporario = tempfile.mkstemp(
+        dir=pasta, prefix=f".{os.path.basename(caminho)}.", suffix='.parcial'
+    )
+    try:
+        with zip_ref.open(info) as origem, os.fdopen(descritor, 'wb') as destino:
+            shutil.copyfileobj(origem, destino, TAMANHO_BUFFER)
+        os.chmod(caminho_temporario, MODO_ARQUIVO)
+        os.replace(caminho_temporario, caminho)
+    except BaseException:
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+
+def _extrair_zip(caminho_zip, pasta_saida, padroes):
+    """
+    Extrai de um ZIP os membros que correspondem aos padrões (executada em paralelo)
+    
+    Returns:
+        tuple: (extraidos, erro) em que extraidos é uma lista de tuplas
+               (padrao, caminho, novo) e erro é a mensagem de erro ou None
+    """
+    nome_arquivo = os.path.basename(caminho_zip)
+    # Uma única expressão regular para todos os padrões
+    expressao = re.compile('|'.join(map(re.escape, padroes)))
+    extraidos = []
+    
+    try:
+        with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                correspondencia = expressao.search(info.filename.upper())
+                if not correspondencia:
+                    continue
+                
+                caminho_extraido = _caminho_destino(pasta_saida, info.filename)
+                if _ja_extraido(caminho_extraido, info):
+                    print(f"🟡 {info.filename} já extraído e íntegro, ignorando")
+                    extraidos.append((correspondencia.group(0), caminho_extraido, False))
+                    continue
+                
+                print(f"🗜️  Extraindo {info.filename} de {nome_arquivo}")
+                _extrair_membro(zip_ref, info, caminho_extraido)
+                extraidos.append((correspondencia.group(0), caminho_extraido, True))
+    except zipfile.BadZipFile:
+        return extraidos, f"⚠️ Arquivo ZIP corrompido: {nome_arquivo}"
+    except Exception as e:
+        return extraidos, f"⚠️ Erro ao extrair {nome_arquivo}: {e}"
+    
+    return extraidos, None
+
+def extrair_arquivos(pasta_zips, pasta_saida="./extraidos", padroes=["EMPRECSV", "ESTABELE"], processos=None):
     """
     Extrai arquivos específicos (EMPRECSV, ESTABELE, etc) dos ZIPs baixados
     
+    Os ZIPs são processados em paralelo. Membros cujo arquivo de destino já
+    existe com o mesmo tamanho e CRC32 registrados no ZIP são ignorados, de
+    modo que uma reexecução só extrai o que falta.
+    
     Args:
         pasta_zips: Diretório com os arquivos ZIP
         pasta_saida: Diretório onde os arquivos serão extraídos
         padroes: Lista de padrões para identificar os arquivos a serem extraídos
+        processos: Quantidade de processos de extração (padrão: número de CPUs)
     
     Returns:
         dict: Dicionário com os arquivos extraídos por tipo
@@ -16,33 +124,34 @@ def extrair_arquivos(pasta_zips, pasta_saida="./extraidos", padroes=["EMPRECSV",
     os.makedirs(pasta_saida, exist_ok=True)
     arquivos_por_tipo = {padrao: [] for padrao in padroes}
     total_extraidos = 0
-
-    for nome_arquivo in os.listdir(pasta_zips):
-        caminho_zip = os.path.join(pasta_zips, nome_arquivo)
-
-        if not zipfile.is_zipfile(caminho_zip):
-            continue
-
-        try:
-            with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
-                for arquivo in zip_ref.namelist():
-                    for padrao in padroes:
-                        if padrao in arquivo.upper():
-                            print(f"🗜️  Extraindo {arquivo} de {nome_arquivo}")
-                            zip_ref.extract(arquivo, path=pasta_saida)
-                            caminho_extraido = os.path.join(pasta_saida, arquivo)
-                            arquivos_por_tipo[padrao].append(caminho_extraido)
-                            total_extraidos += 1
-                            break  # Sai do loop de padrões após encontrar um match
-        except zipfile.BadZipFile:
-            print(f"⚠️ Arquivo ZIP corrompido: {nome_arquivo}")
-        except Exception as e:
-            print(f"⚠️ Erro ao extrair {nome_arquivo}: {e}")
-
+    total_ignorados = 0
+    
+    caminhos_zips = [
+        os.path.join(pasta_zips, nome_arquivo) for nome_arquivo in sorted(os.listdir(pasta_zips))
+        if zipfile.is_zipfile(os.path.join(pasta_zips, nome_arquivo))
+    ]
+    
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultados = executor.map(
+            _extrair_zip, caminhos_zips,
+            [pasta_saida] * len(caminhos_zips), [padroes] * len(caminhos_zips)
+        )
+        for extraidos, erro in resultados:
+            if erro:
+                print(erro)
+            for padrao, caminho_extraido, novo in extraidos:
+                arquivos_por_tipo[padrao].append(caminho_extraido)
+                if novo:
+                    total_extraidos += 1
+                else:
+                    total_ignorados += 1
+    
     # Resumo de extração por tipo
     print(f"\n✅ Extração finalizada. {total_extraidos} arquivos extraídos:")
     for padrao, arquivos in arquivos_por_tipo.items():
         print(f"   - {len(arquivos)} arquivos {padrao}")
+    if total_ignorados:
+        print(f"🔁 {total_ignorados} arquivos já estavam extraídos e foram ignorados.")
     
     return arquivos_por_tipo
 
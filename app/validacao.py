@@ -0,0 +1,212 @@
+import os
+import csv
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from operator import mul
+
+# Pesos do cálculo dos dígitos verificadores do CNPJ
+PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3)
+
+# Os dígitos chegam como bytes ASCII ('0' = 48); a correção é descontada da soma de uma vez
+_AJUSTE_DV1 = 48 * sum(PESOS_DV1)
+_AJUSTE_DV2 = 48 * sum(PESOS_DV2)
+
+# Quantidade de registros validados de cada vez no parse
+TAMANHO_BLOCO_VALIDACAO = 8192
+
+def calcular_dvs(bases):
+    """
+    Calcula os dígitos verificadores de vários CNPJs de uma vez
+
+    Args:
+        bases: Sequência de strings com os 12 primeiros dígitos (cnpj_basico + cnpj_ordem)
+
+    Returns:
+        list: Strings com os 2 dígitos verificadores de cada base
+    """
+    resultado = []
+    for base in bases:
+        digitos = base.encode('ascii')
+        resto = (sum(map(mul, PESOS_DV1, digitos)) - _AJUSTE_DV1) % 11
+        dv1 = 0 if resto < 2 else 11 - resto
+        resto = (sum(map(mul, PESOS_DV2, digitos)) - _AJUSTE_DV2 + 2 * dv1) % 11
+        dv2 = 0 if resto < 2 else 11 - resto
+        resultado.append(f"{dv1}{dv2}")
+    return resultado
+
+def _apenas_digitos(valor, tamanho):
+    return len(valor) == tamanho and valor.isascii() and valor.isdigit()
+
+class ConjuntoCNPJ:
+    """
+    Conjunto compacto de CNPJs (básico + ordem) já vistos.
+
+    As matrizes (ordem 0001), que são a maioria dos estabelecimentos, ocupam
+    um bit cada em um bitmap indexado pelo CNPJ básico (12,5 MB no total).
+    As demais chaves ficam em sequências ordenadas de inteiros de 64 bits,
+    consolidadas em níveis de tamanho crescente, como em uma LSM tree, o que
+    mantém o custo amortizado de inserção baixo e ~8 bytes por chave.
+    """
+
+    def __init__(self, limite_pendentes=262144):
+        """
+        Args:
+            limite_pendentes: Quantidade de chaves mantidas em um set antes de
+                              serem consolidadas em uma sequência ordenada
+        """
+        self.limite_pendentes = limite_pendentes
+        self._matrizes = bytearray(10 ** 8 // 8)
+        self._quantidade_matrizes = 0
+        self._sequencias = []
+        self._pendentes = set()
+
+    def __len__(self):
+        return self._quantidade_matrizes + sum(map(len, self._sequencias)) + len(self._pendentes)
+
+    @property
+    def tamanho_bytes(self):
+        """
+        Memória aproximada ocupada pelas chaves (sem contar as pendentes)
+        """
+        return len(self._matrizes) + sum(s.itemsize * len(s) for s in self._sequencias)
+
+    def adicionar(self, cnpj_basico, cnpj_ordem):
+        """
+        Adiciona um CNPJ ao conjunto
+
+        Args:
+            cnpj_basico: Inteiro com os 8 dígitos do CNPJ básico
+            cnpj_ordem: Inteiro com os 4 dígitos da ordem
+
+        Returns:
+            bool: True se o CNPJ ainda não estava no conjunto
+        """
+        if cnpj_ordem == 1:
+            byte, bit = divmod(cnpj_basico, 8)
+            mascara = 1 << bit
+            if self._matrizes[byte] & mascara:
+                return False
+            self._matrizes[byte] |= mascara
+            self._quantidade_matrizes += 1
+            return True
+
+        chave = cnpj_basico * 10000 + cnpj_ordem
+        if chave in self._pendentes:
+            return False
+        for sequencia in self._sequencias:
+            posicao = bisect_left(sequencia, chave)
+            if posicao < len(sequencia) and sequencia[posicao] == chave:
+                return False
+
+        self._pendentes.add(chave)
+        if len(self._pendentes) >= self.limite_pendentes:
+            self._consolidar()
+        return True
+
+    def _consolidar(self):
+        """
+        Move as chaves pendentes para uma nova sequência ordenada, mesclando-a
+        com as sequências menores ou de tamanho equivalente
+        """
+        nova = array('Q', sorted(self._pendentes))
+        self._pendentes.clear()
+        while self._sequencias and len(self._sequencias[-1]) <= 2 * len(nova):
+            nova = array('Q', heapq.merge(self._sequencias.pop(), nova))
+        self._sequencias.append(nova)
+
+class ValidadorCNPJ:
+    """
+    Etapa de validação do parse de estabelecimentos.
+
+    Confere os dígitos verificadores e descarta CNPJs repetidos (entre
+    arquivos ou já inseridos na carga atual). Os registros rejeitados são
+    contabilizados e, se houver pasta de quarentena, gravados em CSV.
+    """
+
+    def __init__(self, pasta_quarentena=None):
+        """
+        Args:
+            pasta_quarentena: Diretório onde os registros rejeitados são gravados
+                              (se None, eles são apenas contabilizados)
+        """
+        self.vistos = ConjuntoCNPJ()
+        self.rejeitados = Counter()
+        self._arquivo_quarentena = None
+        self._escritor = None
+        if pasta_quarentena:
+            os.makedirs(pasta_quarentena, exist_ok=True)
+            self._arquivo_quarentena = open(
+                os.path.join(pasta_quarentena, 'estabelecimentos_quarentena.csv'),
+                'a', encoding='utf-8', newline=''
+            )
+            self._escritor = csv.writer(self._arquivo_quarentena, delimiter=';')
+
+    def registrar_existentes(self, cnpjs):
+        """
+        Marca como já vistos CNPJs inseridos pela carga atual antes de uma
+        interrupção, para que a reexecução não os insira de novo
+
+        Args:
+            cnpjs: Iterável de tuplas (cnpj_basico, cnpj_ordem)
+
+        Returns:
+            int: Quantidade de CNPJs registrados
+        """
+        quantidade = 0
+        for cnpj_basico, cnpj_ordem in cnpjs:
+            if _apenas_digitos(cnpj_basico, 8) and _apenas_digitos(cnpj_ordem, 4):
+                self.vistos.adicionar(int(cnpj_basico), int(cnpj_ordem))
+                quantidade += 1
+        return quantidade
+
+    def filtrar(self, registros, arquivo=''):
+        """
+        Valida um bloco de estabelecimentos
+
+        Args:
+            registros: Lista de tuplas no formato gerado pelo parse
+                       (cnpj_basico, cnpj_ordem, cnpj_dv, ...)
+            arquivo: Nome do arquivo de origem, gravado na quarentena
+
+        Returns:
+            list: Registros válidos e ainda não vistos
+        """
+        bem_formados = []
+        validos = []
+        for registro in registros:
+            if (_apenas_digitos(registro[0], 8) and _apenas_digitos(registro[1], 4)
+                    and _apenas_digitos(registro[2], 2)):
+                bem_formados.append(registro)
+            else:
+                self._rejeitar(registro, 'cnpj_malformado', arquivo)
+
+        dvs = calcular_dvs([registro[0] + registro[1] for registro in bem_formados])
+        for registro, dv in zip(bem_formados, dvs):
+            if registro[2] != dv:
+                self._rejeitar(registro, 'dv_invalido', arquivo)
+            elif not self.vistos.adicionar(int(registro[0]), int(registro[1])):
+                self._rejeitar(registro, 'duplicado', arquivo)
+            else:
+                validos.append(registro)
+        return validos
+
+    def _rejeitar(self, registro, motivo, arquivo):
+        self.rejeitados[motivo] += 1
+        if self._escritor:
+            self._escritor.writerow((motivo, arquivo, *registro))
+
+    def resumir(self):
+        """
+        Informa a quantidade de registros rejeitados por motivo
+        """
+        for motivo, quantidade in self.rejeitados.items():
+            print(f"⚠️ {quantidade} estabelecimentos rejeitados ({motivo})")
+        if self.rejeitados and self._arquivo_quarentena:
+            print(f"   Registros gravados em {self._arquivo_quarentena.name}")
+
+    def fechar(self):
+        if self._arquivo_quarentena:
+            self._arquivo_quarentena.close()
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# Testes que precisam do PostgreSQL usam o banco de TEST_DATABASE_URL, que deve ser
+# descartável: as tabelas do projeto são removidas antes de cada teste
+TABELAS_PROJETO = (
+    'cnpj_completo', 'cnpj_completo_novo', 'estabelecimentos', 'empresas', 'cargas',
+    'cnaes', 'motivos', 'municipios', 'naturezas', 'paises', 'qualificacoes',
+)
+
+@pytest.fixture
+def conexao_str():
+    conexao_str = os.getenv('TEST_DATABASE_URL')
+    if not conexao_str:
+        pytest.skip('TEST_DATABASE_URL não configurada')
+
+    import psycopg2
+
+    conn = psycopg2.connect(conexao_str)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {', '.join(TABELAS_PROJETO)} CASCADE")
+    finally:
+        conn.close()
+    return conexao_str
@@ -0,0 +1,72 @@
+from app.database import inicializar_banco_dados, registrar_carga
+from app.parse_csv import processar_csv_para_postgres, processar_estabelecimentos_csv
+
+def _contar(conexao_str, sql):
+    conn = inicializar_banco_dados(conexao_str)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
+def _registrar(conexao_str, tabelas):
+    conn = inicializar_banco_dados(conexao_str)
+    try:
+        registrar_carga(conn, tabelas)
+    finally:
+        conn.close()
+
+def test_reexecutar_carga_concluida_substitui_os_dados(conexao_str, tmp_path):
+    (tmp_path / 'K3241.K03200Y0.D50510.EMPRECSV').write_text(
+        '"11222333";"EMPRESA";"2062";"49";"1000,00";"05";""\n'
+        '"44778741";"OUTRA";"2062";"49";"0,00";"01";""\n',
+        encoding='latin-1'
+    )
+    linhas = [
+        ['11222333', '0001', '81', '1', 'LOJA'] + [''] * 25,
+        ['44778741', '0001', '73', '1', 'OUTRA'] + [''] * 25,
+        ['44778741', '0001', '73', '1', 'REPETIDA'] + [''] * 25,
+    ]
+    (tmp_path / 'K3241.K03200Y0.D50510.ESTABELE').write_text(
+        ''.join(';'.join(linha) + '\n' for linha in linhas), encoding='latin-1'
+    )
+
+    # A mesma carga executada duas vezes, cada uma registrada ao final
+    for _ in range(2):
+        total_empresas, _ = processar_csv_para_postgres(str(tmp_path), conexao_str)
+        total_estabelecimentos, _ = processar_estabelecimentos_csv(
+            str(tmp_path), conexao_str, validar_cnpj=True
+        )
+        assert (total_empresas, total_estabelecimentos) == (2, 2)
+        _registrar(conexao_str, ['empresas', 'estabelecimentos'])
+
+    assert _contar(conexao_str, 'SELECT cnpj_basico, COUNT(*) FROM empresas GROUP BY 1 ORDER BY 1') == [
+        ('11222333', 1), ('44778741', 1),
+    ]
+    assert _contar(
+        conexao_str, 'SELECT cnpj_basico, nome_fantasia, COUNT(*) FROM estabelecimentos GROUP BY 1, 2 ORDER BY 1'
+    ) == [('11222333', 'LOJA', 1), ('44778741', 'OUTRA', 1)]
+
+def test_carga_parcial_mantem_as_tabelas_nao_recarregadas(conexao_str):
+    conn = inicializar_banco_dados(conexao_str)
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO empresas (cnpj_basico, razao_social) VALUES ('11222333', 'EMPRESA')")
+        cursor.execute(
+            "INSERT INTO estabelecimentos (cnpj_basico, cnpj_ordem, cnpj_dv) VALUES ('11222333', '0001', '81')"
+        )
+    conn.commit()
+    registrar_carga(conn, ['empresas', 'estabelecimentos'])
+
+    # Nova carga apenas de estabelecimentos
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO estabelecimentos (cnpj_basico, cnpj_ordem, cnpj_dv, nome_fantasia) "
+            "VALUES ('11222333', '0001', '81', 'NOVA')"
+        )
+    conn.commit()
+    registrar_carga(conn, ['estabelecimentos'])
+    conn.close()
+
+    assert _contar(conexao_str, 'SELECT razao_social FROM empresas') == [('EMPRESA',)]
+    assert _contar(conexao_str, 'SELECT nome_fantasia FROM estabelecimentos') == [('NOVA',)]
@@ -0,0 +1,50 @@
+import pytest
+
+from app.consulta import ConsultaCNPJ, normalizar_cnpj
+from app.database import construir_cnpj_completo, inicializar_banco_dados
+
+def _carregar_duas_cargas(conexao_str):
+    # Cada carga acrescenta uma nova cópia dos registros; a segunda é a mais recente
+    conn = inicializar_banco_dados(conexao_str)
+    with conn.cursor() as cursor:
+        for carga in ('ANTIGA', 'NOVA'):
+            cursor.execute(
+                'INSERT INTO empresas (cnpj_basico, razao_social) VALUES (%s, %s)',
+                ('11222333', f'EMPRESA {carga}')
+            )
+            for ordem, dv in (('0001', '81'), ('0002', '62')):
+                cursor.execute(
+                    'INSERT INTO estabelecimentos (cnpj_basico, cnpj_ordem, cnpj_dv, nome_fantasia, uf) '
+                    'VALUES (%s, %s, %s, %s, %s)',
+                    ('11222333', ordem, dv, f'LOJA {ordem} {carga}', 'SP')
+                )
+    conn.commit()
+    return conn
+
+def test_normalizar_cnpj():
+    assert normalizar_cnpj('11.222.333/0001-81') == '11222333000181'
+    assert normalizar_cnpj('4477874', digitos=8) == '04477874'
+    assert normalizar_cnpj('1122233300018100') is None
+
+@pytest.mark.parametrize('usar_cnpj_completo', [False, True])
+def test_consultas_retornam_o_registro_mais_recente(conexao_str, usar_cnpj_completo):
+    conn = _carregar_duas_cargas(conexao_str)
+    try:
+        if usar_cnpj_completo:
+            construir_cnpj_completo(conn)
+    finally:
+        conn.close()
+
+    consulta = ConsultaCNPJ(conexao_str, usar_cnpj_completo=usar_cnpj_completo)
+    try:
+        resultado = consulta.consultar('11.222.333/0001-81')
+        assert resultado['nome_fantasia'] == 'LOJA 0001 NOVA'
+        assert resultado['razao_social'] == 'EMPRESA NOVA'
+
+        estabelecimentos = consulta.consultar_basico('11222333')
+        assert [(e['cnpj'], e['nome_fantasia'], e['razao_social']) for e in estabelecimentos] == [
+            ('11222333000181', 'LOJA 0001 NOVA', 'EMPRESA NOVA'),
+            ('11222333000262', 'LOJA 0002 NOVA', 'EMPRESA NOVA'),
+        ]
+    finally:
+        consulta.fechar()
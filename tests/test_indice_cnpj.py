@@ -0,0 +1,71 @@
+import gc
+import os
+
+from app.indice_cnpj import EscritorIndiceCNPJ, LeitorIndiceCNPJ
+
+def _gerar_indice(caminho, registros, **kwargs):
+    escritor = EscritorIndiceCNPJ(str(caminho), ('nome', 'uf'), **kwargs)
+    for cnpj, valores in registros:
+        escritor.adicionar(cnpj, valores)
+    return escritor.finalizar()
+
+def test_gera_e_consulta_indice(tmp_path):
+    caminho = tmp_path / 'estabelecimentos.idx'
+    registros = [(f'{cnpj:014d}', (f'EMPRESA {cnpj}', 'SP')) for cnpj in range(1000, 0, -1)]
+    registros.append(('00000000000500', ('REPETIDA', 'RJ')))
+    registros.append(('CNPJ INVALIDO', ('IGNORADA', 'RJ')))
+
+    # Blocos pequenos forçam a ordenação externa com vários blocos
+    assert _gerar_indice(caminho, registros, bytes_por_bloco=4096) == 1000
+    assert not [nome for nome in os.listdir(tmp_path) if nome != 'estabelecimentos.idx']
+
+    with LeitorIndiceCNPJ(str(caminho)) as leitor:
+        assert len(leitor) == 1000
+        assert leitor.campos == ('nome', 'uf')
+        assert leitor.buscar('00.000.000/0005-00') == {'nome': 'EMPRESA 500', 'uf': 'SP'}
+        assert leitor.buscar('00000000001001') is None
+        assert leitor.buscar_lote(['00000000000001', '00000000000999', '99999999999999']) == {
+            '00000000000001': {'nome': 'EMPRESA 1', 'uf': 'SP'},
+            '00000000000999': {'nome': 'EMPRESA 999', 'uf': 'SP'},
+            '99999999999999': None,
+        }
+
+def test_fechar_com_registro_bruto_em_uso(tmp_path):
+    caminho = tmp_path / 'empresas.idx'
+    _gerar_indice(caminho, [('11222333000181', ('EMPRESA', 'DF'))])
+
+    with LeitorIndiceCNPJ(str(caminho)) as leitor:
+        registro = leitor.buscar_bruto('11222333000181')
+
+    # A memoryview continua válida após o fechamento
+    assert bytes(registro) == 'EMPRESA\x1fDF'.encode('utf-8')
+    del registro
+    gc.collect()
+    leitor.fechar()
+
+def test_chaves_com_quantidade_de_digitos_diferente(tmp_path):
+    caminho = tmp_path / 'estabelecimentos.idx'
+    registros = [
+        ('00000044778741', ('EMPRESA', 'SP')),
+        ('44778741', ('CNPJ BASICO', 'RJ')),
+        ('1' * 25, ('CHAVE LONGA', 'RJ')),
+    ]
+    assert _gerar_indice(caminho, registros) == 1
+
+    with LeitorIndiceCNPJ(str(caminho)) as leitor:
+        assert leitor.buscar('00000044778741') == {'nome': 'EMPRESA', 'uf': 'SP'}
+        assert leitor.buscar('44778741') is None
+        assert leitor.buscar('0000000044778741') is None
+        assert leitor.buscar_lote(['44778741', '00.000.044/7787-41']) == {
+            '44778741': None,
+            '00.000.044/7787-41': {'nome': 'EMPRESA', 'uf': 'SP'},
+        }
+
+def test_indice_por_cnpj_basico(tmp_path):
+    caminho = tmp_path / 'empresas.idx'
+    registros = [('44778741', ('EMPRESA', 'SP')), ('44778741000173', ('ESTABELECIMENTO', 'SP'))]
+    assert _gerar_indice(caminho, registros, digitos_chave=8) == 1
+
+    with LeitorIndiceCNPJ(str(caminho)) as leitor:
+        assert leitor.buscar('44778741') == {'nome': 'EMPRESA', 'uf': 'SP'}
+        assert leitor.buscar('44778741000173') is None
@@ -0,0 +1,69 @@
+import pytest
+
+from app.lote import EnvioParalelo, ErroEnvioLote, LoteAdaptativo, formatar_linha_copy
+
+class _Conexao:
+    def close(self):
+        pass
+
+def _falhar(*args):
+    raise RuntimeError('COPY falhou')
+
+def test_formatar_linha_copy_escapa_caracteres_especiais():
+    linha = formatar_linha_copy(('a\tb', 'c\nd', 'e\\f', 'g\rh', None, 1.5, 'Ação'))
+    assert linha == 'a\\tb\tc\\nd\te\\\\f\tg\\rh\t\t1.5\tAção\n'.encode('utf-8')
+
+def test_registrar_envio_respeita_limites():
+    lote = LoteAdaptativo(orcamento_bytes=8 * 1024 * 1024, limite_minimo=1024 * 1024)
+    for _ in range(50):
+        lote.registrar_envio(100 * 1024 * 1024, 0.01)
+    assert lote.limite_bytes == lote.orcamento_bytes
+
+    for _ in range(50):
+        lote.registrar_envio(1024, 10.0)
+    assert lote.limite_bytes == lote.limite_minimo
+
+def test_descarregar_mantem_registros_se_o_envio_falhar():
+    lote = LoteAdaptativo()
+    lote.adicionar(('11222333', 'EMPRESA'))
+    lote.adicionar(('44778741', 'OUTRA'))
+
+    with pytest.raises(ErroEnvioLote):
+        lote.descarregar(_falhar)
+    assert lote.linhas == 2
+
+    recebidos = []
+    assert lote.descarregar(lambda arquivo: recebidos.append(arquivo.read())) == 2
+    assert recebidos == [b'11222333\tEMPRESA\n44778741\tOUTRA\n']
+    assert lote.linhas == 0 and lote.tamanho_bytes == 0
+
+def test_envio_paralelo_propaga_erro_sem_retirar_o_lote_seguinte():
+    # Orçamento mínimo: cada envio aguarda o anterior, que falhou
+    envio = EnvioParalelo(_Conexao, paralelismo=2, orcamento_bytes=1)
+    try:
+        primeiro = LoteAdaptativo()
+        primeiro.adicionar(('11222333',))
+        assert envio.enviar(primeiro, _falhar) == 0
+
+        segundo = LoteAdaptativo()
+        segundo.adicionar(('44778741',))
+        with pytest.raises(ErroEnvioLote):
+            envio.enviar(segundo, _falhar)
+        assert segundo.linhas == 1
+    finally:
+        envio.fechar()
+
+def test_envio_paralelo_contabiliza_apenas_envios_confirmados():
+    recebidos = []
+    envio = EnvioParalelo(_Conexao, paralelismo=2)
+    try:
+        total = 0
+        for cnpj in ('11222333', '44778741', '33000167'):
+            lote = LoteAdaptativo()
+            lote.adicionar((cnpj,))
+            total += envio.enviar(lote, lambda conn, arquivo: recebidos.append(arquivo.read()))
+        total += envio.finalizar()
+    finally:
+        envio.fechar()
+    assert total == 3
+    assert sorted(recebidos) == [b'11222333\n', b'33000167\n', b'44778741\n']
@@ -0,0 +1,133 @@
+import pytest
+
+from app import database, parse_csv
+from app.validacao import ConjuntoCNPJ, ValidadorCNPJ, calcular_dvs
+
+class _Cursor:
+    def __init__(self, consultas, linhas):
+        self.consultas = consultas
+        self.linhas = linhas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, parametros=None):
+        self.consultas.append(sql)
+
+    def __iter__(self):
+        return iter(self.linhas)
+
+class _Conexao:
+    def __init__(self, linhas=()):
+        self.consultas = []
+        self.linhas = list(linhas)
+
+    def cursor(self, name=None):
+        return _Cursor(self.consultas, self.linhas)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def _linha_estabelecimento(cnpj_basico, cnpj_ordem, cnpj_dv):
+    return ';'.join([cnpj_basico, cnpj_ordem, cnpj_dv, '1', 'NOME'] + [''] * 25) + '\n'
+
+def test_calcular_dvs():
+    assert calcular_dvs(['112223330001', '447787410001']) == ['81', '73']
+
+def test_conjunto_cnpj_detecta_repetidos_apos_consolidar():
+    conjunto = ConjuntoCNPJ(limite_pendentes=4)
+    for ordem in range(2, 20):
+        assert conjunto.adicionar(11222333, ordem)
+    assert conjunto.adicionar(11222333, 1)
+    for ordem in range(1, 20):
+        assert not conjunto.adicionar(11222333, ordem)
+    assert len(conjunto) == 19
+
+def test_validador_rejeita_dv_invalido_malformado_e_repetido():
+    validador = ValidadorCNPJ()
+    validador.registrar_existentes([('44778741', '0001')])
+    registros = [
+        ('11222333', '0001', '81', 'a'),
+        ('11222333', '0001', '81', 'b'),
+        ('11222333', '0001', '82', 'c'),
+        ('1122233X', '0001', '81', 'd'),
+        ('44778741', '0001', '73', 'e'),
+    ]
+    assert validador.filtrar(registros) == [registros[0]]
+    assert validador.rejeitados == {'duplicado': 2, 'dv_invalido': 1, 'cnpj_malformado': 1}
+
+def test_validar_cnpj_so_trata_como_repetidos_os_da_carga_atual(tmp_path, monkeypatch):
+    # Uma reexecução da carga encontra no banco apenas 11222333000181 como
+    # inserido pela carga atual; 44778741000173 é de uma carga anterior
+    (tmp_path / 'K3241.K03200Y0.D50510.ESTABELE').write_text(
+        _linha_estabelecimento('11222333', '0001', '81') + _linha_estabelecimento('44778741', '0001', '73'),
+        encoding='latin-1'
+    )
+    carga_atual = _Conexao([('11222333', '0001')])
+    copiados = []
+
+    def copiar(conn, dados, tabela='estabelecimentos'):
+        copiados.extend(dados.read().decode('utf-8').splitlines())
+
+    monkeypatch.setattr(parse_csv, 'inicializar_banco_dados', lambda *args, **kwargs: carga_atual)
+    monkeypatch.setattr(parse_csv, 'criar_roteador_estabelecimentos', lambda conn: (['estabelecimentos'], None))
+    monkeypatch.setattr(parse_csv, 'copiar_estabelecimentos_lote', copiar)
+
+    total, arquivos = parse_csv.processar_estabelecimentos_csv(str(tmp_path), validar_cnpj=True)
+
+    assert total == 1
+    assert len(arquivos) == 1
+    assert [linha.split('\t')[:3] for linha in copiados] == [['44778741', '0001', '73']]
+
+def _inserir_estabelecimentos(conn, cnpjs):
+    with conn.cursor() as cursor:
+        for cnpj_basico, cnpj_ordem in cnpjs:
+            cursor.execute(
+                "INSERT INTO estabelecimentos (cnpj_basico, cnpj_ordem, cnpj_dv) VALUES (%s, %s, '00')",
+                (cnpj_basico, cnpj_ordem)
+            )
+    conn.commit()
+
+def test_iterar_cnpjs_carga_atual_ignora_cargas_registradas(conexao_str):
+    conn = database.inicializar_banco_dados(conexao_str)
+    try:
+        _inserir_estabelecimentos(conn, [('11222333', '0001'), ('44778741', '0001')])
+        # Registrada sem substituir tabelas, a carga anterior continua no banco
+        database.registrar_carga(conn)
+        _inserir_estabelecimentos(conn, [('11222333', '0002')])
+
+        assert list(database.iterar_cnpjs_carga_atual(conn, tamanho_bloco=1)) == [('11222333', '0002')]
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('controle_anterior', ['sem_tabela_cargas', 'sem_ultimo_id'])
+def test_atualizacao_nao_trata_dados_existentes_como_carga_atual(conexao_str, controle_anterior):
+    # Simula um banco carregado antes do controle de cargas
+    conn = database.inicializar_banco_dados(conexao_str)
+    with conn.cursor() as cursor:
+        if controle_anterior == 'sem_tabela_cargas':
+            cursor.execute('DROP TABLE cargas')
+        else:
+            cursor.execute('ALTER TABLE cargas DROP COLUMN ultimo_id_estabelecimento')
+            cursor.execute('INSERT INTO cargas DEFAULT VALUES')
+    conn.commit()
+    _inserir_estabelecimentos(conn, [('11222333', '0001'), ('44778741', '0001')])
+    conn.close()
+
+    conn = database.inicializar_banco_dados(conexao_str)
+    try:
+        assert list(database.iterar_cnpjs_carga_atual(conn)) == []
+
+        # Novas inicializações não registram outra carga de referência
+        conn.close()
+        conn = database.inicializar_banco_dados(conexao_str)
+        _inserir_estabelecimentos(conn, [('11222333', '0001')])
+        assert list(database.iterar_cnpjs_carga_atual(conn)) == [('11222333', '0001')]
+    finally:
+        conn.close()